@@ -4,8 +4,145 @@ Extract unread links from Pocket CSV exports and save to a new file.
 """
 
 import csv
+import mmap
 import os
 from datetime import datetime
+from itertools import chain
+
+def quoted_field_open(line, in_quotes):
+    """Return whether a quoted field is still open at the end of a raw line."""
+    
+    # Mirrors csv.reader: a quote only opens a quoted field at the start of a
+    # field; anywhere else in an unquoted field it is a literal character
+    field_start = True
+    i = 0
+    
+    while i < len(line):
+        if in_quotes:
+            end = line.find(b'"', i)
+            if end < 0:
+                return True
+            if line[end + 1:end + 2] == b'"':
+                i = end + 2  # Escaped quote inside the field
+                continue
+            in_quotes = False
+            field_start = False
+            i = end + 1
+        elif field_start and line[i:i + 1] == b'"':
+            in_quotes = True
+            i += 1
+        else:
+            comma = line.find(b',', i)
+            if comma < 0:
+                return False
+            field_start = True
+            i = comma + 1
+    
+    return in_quotes
+
+def has_unread_status(line):
+    """Return whether the fifth field of an unquoted raw line contains 'unread'."""
+    fields = line.split(b',', 5)
+    return len(fields) >= 5 and b'unread' in fields[4]
+
+def universal_lines(mm):
+    """Yield raw lines with universal newlines, as a text-mode open() would."""
+    
+    for line in iter(mm.readline, b''):
+        if b'\r' not in line:
+            yield line
+            continue
+        
+        # Both '\r\n' and a lone '\r' end a line; normalise them to '\n'
+        for piece in line.splitlines(keepends=True):
+            yield piece.rstrip(b'\r\n') + b'\n'
+
+def unread_candidate_lines(mm):
+    """Yield the decoded lines of records that may have an 'unread' status.
+    
+    >>> import io
+    >>> export = io.BytesIO(b'title,url,time_added,tags,status\\n'
+    ...                     b'A 5" screen,http://a,1,,unread\\n'
+    ...                     b'B,http://b,2,,unread\\n'
+    ...                     b'C 7" tab,http://c,3,,archive\\n'
+    ...                     b'D,http://d,4,,unread,\\n'
+    ...                     b'"E\\nwrapped",http://e,5,,unread\\n'
+    ...                     b'F,http://f,6,,archive\\n')
+    >>> [row[0] for row in csv.reader(unread_candidate_lines(export)) if row[4] == 'unread']
+    ['A 5" screen', 'B', 'D', 'E\\nwrapped']
+    """
+    
+    record = []
+    in_quotes = False
+    first_record = True
+    
+    for line in universal_lines(mm):
+        if not in_quotes and (b'"' not in line or (not line.startswith(b'"') and b',"' not in line)):
+            # No field starts with a quote, so any quotes are literal and
+            # csv.reader splits the line on every comma. The status (fifth)
+            # field can then be checked on the raw bytes and archived records
+            # rejected before they are decoded or parsed. The first record is
+            # always kept so the header can still be detected.
+            if first_record or (b'unread' in line and has_unread_status(line)):
+                yield line.decode('utf-8', 'replace')
+            first_record = False
+            continue
+        
+        record.append(line)
+        in_quotes = quoted_field_open(line, in_quotes)
+        if in_quotes:
+            continue  # Quoted field continues on the next line
+        
+        # Field boundaries of quoted records are left to csv.reader, so they
+        # are only rejected when 'unread' appears nowhere in them; a false
+        # positive just costs one parse
+        if first_record or any(b'unread' in raw for raw in record):
+            for raw in record:
+                yield raw.decode('utf-8', 'replace')
+        
+        record = []
+        first_record = False
+    
+    # Unterminated quoted field at end of file: let csv.reader deal with it
+    for raw in record:
+        yield raw.decode('utf-8', 'replace')
+
+def extract_file_unread(file_path, csv_file):
+    """Yield the unread links from a single pocket CSV file."""
+    
+    if os.path.getsize(file_path) == 0:
+        return  # mmap cannot map an empty file
+    
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        # Read lines straight from the page cache and only parse likely matches
+        lines = unread_candidate_lines(mm)
+        
+        # Use csv.reader to handle the malformed CSV properly
+        reader = csv.reader(lines)
+        
+        # Skip header if it exists
+        first_row = next(reader, None)
+        if first_row is None:
+            return
+        
+        if first_row[:1] == ['title']:
+            print(f"  Header found: {first_row}")
+            rows = reader
+        else:
+            # No header: put the row back instead of seeking and re-reading the file
+            rows = chain([first_row], reader)
+        
+        # Malformed (short) rows are skipped silently: most never get past the
+        # prefilter, so per-row warnings would be incomplete
+        for row in rows:
+            # Handle rows with different lengths due to CSV formatting issues
+            if len(row) >= 5:  # title, url, time_added, tags, status
+                # Check status before touching the other fields so
+                # archived rows cost a single comparison
+                if row[4].strip() == 'unread':
+                    # Strip the remaining fields in one C-level pass
+                    title, url, time_added, tags = map(str.strip, row[:4])
+                    yield (title, url, time_added, tags, 'unread', csv_file)
 
 def extract_unread_links():
     """Extract all unread links from pocket CSV files."""
@@ -13,105 +150,67 @@ def extract_unread_links():
     pocket_dir = "pocket"
     csv_files = ["part_000000.csv", "part_000001.csv"]
     
-    unread_links = []
+    samples = []  # First few unread links, kept for the preview
     total_unread = 0
     
     print("Extracting unread links from Pocket exports...")
     print("=" * 50)
     
-    for csv_file in csv_files:
-        file_path = os.path.join(pocket_dir, csv_file)
-        
-        if not os.path.exists(file_path):
-            print(f"Warning: {file_path} not found, skipping...")
-            continue
-            
-        print(f"Processing {csv_file}...")
+    # Stream unread links to the output CSV as they are found. They go to a
+    # temporary file first so an existing output survives a run that finds
+    # no unread links (e.g. when the exports are missing).
+    output_file = "pocket_unread_links.csv"
+    tmp_file = output_file + ".tmp"
+    
+    with open(tmp_file, 'w', newline='', encoding='utf-8') as out:
+        writer = csv.writer(out)
         
-        file_unread = 0
+        # Write header
+        writer.writerow(['title', 'url', 'time_added', 'tags', 'status', 'source_file'])
         
-        try:
-            with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-                # Use csv.reader to handle the malformed CSV properly
-                reader = csv.reader(f)
-                
-                # Skip header if it exists
-                try:
-                    header = next(reader)
-                    if header[0] == 'title':
-                        print(f"  Header found: {header}")
-                    else:
-                        # Reset file if first line wasn't header
-                        f.seek(0)
-                except StopIteration:
-                    continue
+        for csv_file in csv_files:
+            file_path = os.path.join(pocket_dir, csv_file)
+            
+            if not os.path.exists(file_path):
+                print(f"Warning: {file_path} not found, skipping...")
+                continue
                 
-                for row_num, row in enumerate(reader, 1):
-                    # Handle rows with different lengths due to CSV formatting issues
-                    if len(row) >= 5:  # title, url, time_added, tags, status
-                        title, url, time_added, tags, status = row[:5]
-                        
-                        if status.strip() == 'unread':
-                            unread_links.append({
-                                'title': title.strip(),
-                                'url': url.strip(),
-                                'time_added': time_added.strip(),
-                                'tags': tags.strip(),
-                                'status': status.strip(),
-                                'source_file': csv_file
-                            })
-                            file_unread += 1
-                    
-                    elif len(row) == 1 and row[0].strip() == 'unread':
-                        # Handle cases where 'unread' appears on its own line
-                        # This might be part of a wrapped CSV entry
-                        continue
-                    
-                    # Log problematic rows for debugging
-                    if len(row) < 5 and len(row) > 0:
-                        if row_num <= 10:  # Only log first 10 problematic rows
-                            print(f"  Warning: Row {row_num} has {len(row)} columns: {row}")
-        
-        except Exception as e:
-            print(f"Error processing {csv_file}: {e}")
-            continue
+            print(f"Processing {csv_file}...")
+            
+            file_unread = 0
+            
+            try:
+                for link in extract_file_unread(file_path, csv_file):
+                    writer.writerow(link)
+                    if len(samples) < 5:
+                        samples.append(link)
+                    file_unread += 1
             
-        print(f"  Found {file_unread} unread links in {csv_file}")
-        total_unread += file_unread
+            except Exception as e:
+                print(f"Error processing {csv_file}: {e}")
+                continue
+                
+            print(f"  Found {file_unread} unread links in {csv_file}")
+            total_unread += file_unread
+    
+    if total_unread:
+        os.replace(tmp_file, output_file)
+    else:
+        os.remove(tmp_file)
     
     print("=" * 50)
     print(f"Total unread links found: {total_unread}")
     
-    # Save unread links to new CSV file
-    output_file = "pocket_unread_links.csv"
-    
-    if unread_links:
-        with open(output_file, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            
-            # Write header
-            writer.writerow(['title', 'url', 'time_added', 'tags', 'status', 'source_file'])
-            
-            # Write unread links
-            for link in unread_links:
-                writer.writerow([
-                    link['title'],
-                    link['url'],
-                    link['time_added'], 
-                    link['tags'],
-                    link['status'],
-                    link['source_file']
-                ])
-        
+    if total_unread:
         print(f"✅ Unread links saved to: {output_file}")
         
         # Show some sample entries
         print("\nSample unread links:")
         print("-" * 50)
-        for i, link in enumerate(unread_links[:5]):
-            timestamp = datetime.fromtimestamp(int(link['time_added'])) if link['time_added'].isdigit() else 'Invalid timestamp'
-            print(f"{i+1}. {link['title'][:60]}...")
-            print(f"   URL: {link['url'][:80]}...")
+        for i, (title, url, time_added, *_) in enumerate(samples):
+            timestamp = datetime.fromtimestamp(int(time_added)) if time_added.isdigit() else 'Invalid timestamp'
+            print(f"{i+1}. {title[:60]}...")
+            print(f"   URL: {url[:80]}...")
             print(f"   Added: {timestamp}")
             print()
     